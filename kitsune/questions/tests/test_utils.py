@@ -1,3 +1,8 @@
+import re
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 from kitsune.questions.models import Answer, Question
 from kitsune.questions.tests import AnswerFactory, QuestionFactory
 from kitsune.questions.utils import (get_mobile_product_from_ua,
@@ -92,6 +97,30 @@ class FlagUserContentAsSpamTestCase(TestCase):
         eq_(0, Answer.objects.filter(is_spam=False, creator=u).count())
         eq_(3, Answer.objects.filter(is_spam=True, creator=u).count())
 
+    def _count_question_fetches(self, answer_count):
+        """Mark a user with `answer_count` answers, each on its own question,
+        as spam and count the queries that look up a single question by pk.
+        """
+        u = UserFactory()
+        for _ in range(answer_count):
+            AnswerFactory(creator=u)
+        table = Question._meta.db_table
+        fetch = re.compile(r'FROM %s WHERE %s\.id = \d+' % (table, table))
+
+        with CaptureQueriesContext(connection) as ctx:
+            mark_content_as_spam(u, UserFactory())
+
+        # Drop the backend's identifier quoting so the pattern fits any db.
+        sql = [q['sql'].replace('`', '').replace('"', '') for q in ctx.captured_queries]
+        return len([s for s in sql if fetch.search(s)])
+
+    def test_flag_content_as_spam_does_not_fetch_questions_per_answer(self):
+        # Each answer still gets its own save, so the total number of queries
+        # grows with the answers; the parent questions must not be looked up
+        # one at a time on top of that.
+        eq_(0, self._count_question_fetches(1))
+        eq_(0, self._count_question_fetches(3))
+
 
 class GetMobileProductFromUATests(TestCase):
 
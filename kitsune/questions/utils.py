@@ -31,7 +31,9 @@ def mark_content_as_spam(user, by_user):
     for question in Question.objects.filter(creator=user):
         question.mark_as_spam(by_user)
 
-    for answer in Answer.objects.filter(creator=user):
+    # Answer.save() updates the parent question, so fetch it up front
+    # rather than once per answer.
+    for answer in Answer.objects.filter(creator=user).select_related('question'):
         answer.mark_as_spam(by_user)
 
 
@@ -1,9 +1,11 @@
 
 from django.contrib import messages
+from django.contrib.auth.models import Group, User
 from django.contrib.messages.middleware import MessageMiddleware
 from django.contrib.sessions.middleware import SessionMiddleware
+from django.db.models import Count
 from django.test.client import RequestFactory
-from nose.tools import eq_
+from django.utils.http import urlencode
 from pyquery import PyQuery as pq
 
 from kitsune.questions.models import Answer, Question
@@ -12,110 +14,129 @@ from kitsune.sumo.tests import LocalizingClient, TestCase
 from kitsune.sumo.urlresolvers import reverse
 from kitsune.users.models import (CONTRIBUTOR_GROUP, Deactivation, Profile,
                                   Setting)
-from kitsune.users.tests import GroupFactory, UserFactory, add_permission
+from kitsune.users.tests import UserFactory, add_permission
 from kitsune.users.views import edit_profile
 
 
+# These pin their locale, so they don't depend on the thread's URL prefixer
+# and can be reversed once at import time.
+DEACTIVATE_URL = reverse('users.deactivate', locale='en-US')
+DEACTIVATE_SPAM_URL = reverse('users.deactivate-spam', locale='en-US')
+EDIT_SETTINGS_URL = reverse('users.edit_settings', locale='en-US')
+
+
 class MakeContributorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        Group.objects.get_or_create(name=CONTRIBUTOR_GROUP)
+
     def setUp(self):
-        self.user = UserFactory()
-        self.client.login(username=self.user.username, password='testpass')
-        GroupFactory(name=CONTRIBUTOR_GROUP)
+        self.client.force_login(self.user)
         super(MakeContributorTests, self).setUp()
 
     def test_make_contributor(self):
         """Test adding a user to the contributor group"""
-        eq_(0, self.user.groups.filter(name=CONTRIBUTOR_GROUP).count())
+        self.assertEqual(0, self.user.groups.filter(name=CONTRIBUTOR_GROUP).count())
 
         response = self.client.post(reverse('users.make_contributor',
                                             force_locale=True))
-        eq_(302, response.status_code)
+        self.assertEqual(302, response.status_code)
 
-        eq_(1, self.user.groups.filter(name=CONTRIBUTOR_GROUP).count())
+        self.assertEqual(1, self.user.groups.filter(name=CONTRIBUTOR_GROUP).count())
 
 
 class UserSettingsTests(TestCase):
+    # The form input is fixed, so encode it once rather than on every post.
+    settings_body = urlencode({'forums_watch_new_thread': True})
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.profile = cls.user.profile
+
     def setUp(self):
-        self.user = UserFactory()
-        self.profile = self.user.profile
-        self.client.login(username=self.user.username, password='testpass')
+        self.client.force_login(self.user)
         super(UserSettingsTests, self).setUp()
 
     def test_create_setting(self):
-        url = reverse('users.edit_settings', locale='en-US')
-        eq_(Setting.objects.filter(user=self.user).count(), 0)  # No settings
-        res = self.client.get(url, follow=True)
-        eq_(200, res.status_code)
-        res = self.client.post(url, {'forums_watch_new_thread': True},
-                               follow=True)
-        eq_(200, res.status_code)
+        url = EDIT_SETTINGS_URL
+        self.assertEqual(Setting.objects.filter(user=self.user).count(), 0)  # No settings
+        res = self.client.get(url)
+        self.assertEqual(200, res.status_code)
+        # A valid form redirects back to the settings page; the saved
+        # setting is what matters, so don't follow it.
+        res = self.client.post(url, self.settings_body,
+                               content_type='application/x-www-form-urlencoded')
+        self.assertEqual(302, res.status_code)
         assert Setting.get_for_user(self.user, 'forums_watch_new_thread')
 
 
 class UserProfileTests(TestCase):
-    def setUp(self):
-        self.user = UserFactory()
-        self.profile = self.user.profile
-        self.userrl = reverse('users.profile', args=[self.user.username], locale='en-US')
-        super(UserProfileTests, self).setUp()
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.profile = cls.user.profile
+        cls.userrl = reverse('users.profile', args=[cls.user.username], locale='en-US')
 
     def test_ProfileFactory(self):
         res = self.client.get(self.userrl)
         self.assertContains(res, self.user.username)
 
-    def test_profile_redirect(self):
-        """Ensure that old profile URL's get redirected."""
-        res = self.client.get(reverse('users.profile', args=[self.user.pk],
-                                      locale='en-US'))
-        eq_(302, res.status_code)
-
-    def test_profile_inactive(self):
-        """Inactive users don't have a public profile."""
-        self.user.is_active = False
-        self.user.save()
+    def test_profile_http_matrix(self):
+        """Old profile URLs redirect, POST isn't allowed and inactive users
+        don't have a public profile."""
+        old_url = reverse('users.profile', args=[self.user.pk], locale='en-US')
+        for method, url, status in [('get', old_url, 302),
+                                    ('post', self.userrl, 405)]:
+            res = getattr(self.client, method)(url)
+            self.assertEqual(status, res.status_code, '%s %s' % (method.upper(), url))
+
+        # Deactivate last so the other cases see an active user. Update the
+        # row directly so the instance shared via setUpTestData stays active.
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
         res = self.client.get(self.userrl)
-        eq_(404, res.status_code)
-
-    def test_profile_post(self):
-        res = self.client.post(self.userrl)
-        eq_(405, res.status_code)
+        self.assertEqual(404, res.status_code)
 
     def test_profile_deactivate(self):
         """Test user deactivation"""
         p = UserFactory().profile
 
-        self.client.login(username=self.user.username, password='testpass')
-        res = self.client.post(reverse('users.deactivate', locale='en-US'), {'user_id': p.user.id})
+        self.client.force_login(self.user)
+        res = self.client.post(DEACTIVATE_URL, {'user_id': p.user.id})
 
-        eq_(403, res.status_code)
+        self.assertEqual(403, res.status_code)
 
         add_permission(self.user, Profile, 'deactivate_users')
-        res = self.client.post(reverse('users.deactivate', locale='en-US'), {'user_id': p.user.id})
+        res = self.client.post(DEACTIVATE_URL, {'user_id': p.user.id})
 
-        eq_(302, res.status_code)
+        self.assertEqual(302, res.status_code)
 
         log = Deactivation.objects.get(user_id=p.user_id)
-        eq_(log.moderator_id, self.user.id)
+        self.assertEqual(log.moderator_id, self.user.id)
 
-        p = Profile.objects.get(user_id=p.user_id)
+        p = Profile.objects.select_related('user').get(user_id=p.user_id)
         assert not p.user.is_active
 
     def test_deactivate_and_flag_spam(self):
-        self.client.login(username=self.user.username, password='testpass')
+        self.client.force_login(self.user)
         add_permission(self.user, Profile, 'deactivate_users')
 
         # Verify content is flagged as spam when requested.
         u = UserFactory()
         AnswerFactory(creator=u)
         QuestionFactory(creator=u)
-        url = reverse('users.deactivate-spam', locale='en-US')
-        res = self.client.post(url, {'user_id': u.id})
+        res = self.client.post(DEACTIVATE_SPAM_URL, {'user_id': u.id})
 
-        eq_(302, res.status_code)
-        eq_(1, Question.objects.filter(creator=u, is_spam=True).count())
-        eq_(0, Question.objects.filter(creator=u, is_spam=False).count())
-        eq_(1, Answer.objects.filter(creator=u, is_spam=True).count())
-        eq_(0, Answer.objects.filter(creator=u, is_spam=False).count())
+        self.assertEqual(302, res.status_code)
+        # Count spam and ham per model in a single GROUP BY query; a
+        # missing False key means no ham is left.
+        self.assertEqual({True: 1}, dict(
+            Question.objects.filter(creator=u).order_by()
+            .values_list('is_spam').annotate(Count('pk'))))
+        self.assertEqual({True: 1}, dict(
+            Answer.objects.filter(creator=u).order_by()
+            .values_list('is_spam').annotate(Count('pk'))))
 
 
 class ProfileNotificationTests(TestCase):
@@ -124,18 +145,27 @@ class ProfileNotificationTests(TestCase):
     We use RequestFactory because the request object from self.client.request
     cannot be passed into messages.info()
     """
+    @classmethod
+    def setUpClass(cls):
+        super(ProfileNotificationTests, cls).setUpClass()
+        cls.rf = RequestFactory()
+        cls.session_middleware = SessionMiddleware()
+        cls.message_middleware = MessageMiddleware()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.url = reverse('users.edit_profile', args=[cls.user.username])
+
     def _get_request(self):
-        user = UserFactory()
-        request = RequestFactory().get(reverse('users.edit_profile', args=[user.username]))
-        request.user = user
+        request = self.rf.get(self.url)
+        request.user = self.user
         request.LANGUAGE_CODE = 'en'
 
-        middleware = SessionMiddleware()
-        middleware.process_request(request)
+        self.session_middleware.process_request(request)
         request.session.save()
 
-        middleware = MessageMiddleware()
-        middleware.process_request(request)
+        self.message_middleware.process_request(request)
         request.session.save()
         return request
 
@@ -143,20 +173,19 @@ class ProfileNotificationTests(TestCase):
         request = self._get_request()
         messages.info(request, 'fxa_notification_updated')
         response = edit_profile(request)
-        doc = pq(response.content)
-        eq_(1, len(doc('#fxa-notification-updated')))
-        eq_(0, len(doc('#fxa-notification-created')))
+        self.assertIn(b'id="fxa-notification-updated"', response.content)
+        self.assertNotIn(b'id="fxa-notification-created"', response.content)
 
     def test_non_fxa_notification_created(self):
         request = self._get_request()
         text = 'This is a helpful piece of information'
         messages.info(request, text)
         response = edit_profile(request)
+        self.assertNotIn(b'id="fxa-notification-updated"', response.content)
+        self.assertNotIn(b'id="fxa-notification-created"', response.content)
         doc = pq(response.content)
-        eq_(0, len(doc('#fxa-notification-updated')))
-        eq_(0, len(doc('#fxa-notification-created')))
-        eq_(1, len(doc('.user-messages li')))
-        eq_(doc('.user-messages li').text(), text)
+        self.assertEqual(1, len(doc('.user-messages li')))
+        self.assertEqual(doc('.user-messages li').text(), text)
 
 
 class FXAAuthenticationTests(TestCase):